@@ -0,0 +1,19 @@
+"""
+Entry point for running the API locally: `python .` from the project root.
+
+Reads HOST and PORT from the environment (see .env.example).
+"""
+
+import os
+
+import uvicorn
+from dotenv import load_dotenv
+
+load_dotenv()
+
+if __name__ == "__main__":
+    uvicorn.run(
+        "clock_:app",
+        host=os.getenv("HOST", "127.0.0.1"),
+        port=int(os.getenv("PORT", "8000"))
+    )
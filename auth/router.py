@@ -7,84 +7,207 @@ Handles user registration, login, and token validation using MongoDB via Beanie.
 from fastapi import APIRouter, Depends, HTTPException, status
 from typing import Optional
 from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError, jwt
+import jwt
 from auth.schemas import User, UserRegister, UserLogin, Token, TokenData, AdminKeyRequest
-from auth.utils import verify_password, get_password_hash, create_access_token, SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES, ADMIN_KEY
-from datetime import timedelta
-from database.models import UserDocument, UserRole
+from auth.utils import verify_password, get_password_hash, needs_rehash, create_access_token, decode_access_token, ADMIN_KEY
+from database.models import UserDocument, UserAuthView, UserProfileView, UserRole
+import asyncio
+import functools
 import secrets
 import re
 import random
 import os
+import httpx
+import orjson
+from cachetools import TTLCache
 from starlette.requests import Request
 from authlib.integrations.starlette_client import OAuth
-from starlette.config import Config
 from fastapi.responses import RedirectResponse
+from utils.responses import ORJSONResponse
+from pymongo import ReturnDocument
 from pymongo.errors import DuplicateKeyError
 
-router = APIRouter(prefix="/auth", tags=["auth"])
+router = APIRouter(prefix="/auth", tags=["auth"], default_response_class=ORJSONResponse)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
+# Characters stripped when deriving a username from an email or provider login
+_USERNAME_STRIP = re.compile(r'[^a-z0-9]')
 
+# User cache: email -> UserAuthView
+# Read-only; any code path that writes a user must call invalidate_user().
+_USER_CACHE: TTLCache = TTLCache(maxsize=50_000, ttl=30)
 
-async def get_user_from_db(email: str) -> Optional[UserDocument]:
-    """Fetch user from MongoDB by email."""
-    return await UserDocument.find_one(UserDocument.email == email)
 
+async def get_user_from_db(email: str) -> Optional[UserAuthView]:
+    """Fetch the auth fields of a user from MongoDB by email (cached for 30 seconds)."""
+    user = _USER_CACHE.get(email)
+    if user is None:
+        user = await UserDocument.find_one(UserDocument.email == email).project(UserAuthView)
+        if user is not None:
+            _USER_CACHE[email] = user
+    return user
+
+
+# Profile cache: email -> UserProfileView
+# Shares invalidate_user() with the user cache, so the same writes keep it fresh.
+_PROFILE_CACHE: TTLCache = TTLCache(maxsize=50_000, ttl=30)
+
+
+async def get_user_profile(email: str) -> Optional[UserProfileView]:
+    """Fetch the profile fields of a user from MongoDB by email (cached for 30 seconds)."""
+    profile = _PROFILE_CACHE.get(email)
+    if profile is None:
+        profile = await UserDocument.find_one(UserDocument.email == email).project(UserProfileView)
+        if profile is not None:
+            _PROFILE_CACHE[email] = profile
+    return profile
+
+
+def peek_cached_user(email: str) -> Optional[UserAuthView]:
+    """Return the cached user if present, without ever querying MongoDB."""
+    return _USER_CACHE.get(email)
 
-async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
+
+@functools.cache
+def _dummy_hash() -> str:
     """
-    Validate JWT token and return current user.
-    
-    Raises HTTPException 401 if token is invalid or user doesn't exist.
+    Hash verified against when the account doesn't exist, so that unknown
+    emails take as long as wrong passwords (prevents timing-based user
+    enumeration). Computed on first use rather than at import.
     """
-    credentials_exception = HTTPException(
+    return get_password_hash("not-a-real-password")
+
+
+def _verify_dummy(password: str) -> None:
+    verify_password(password, _dummy_hash())
+
+
+def invalidate_user(email: str) -> None:
+    """Drop a cached user (auth fields and profile) so the next lookup reads fresh data from MongoDB."""
+    _USER_CACHE.pop(email, None)
+    _PROFILE_CACHE.pop(email, None)
+
+
+# Accounts disabled by an admin while their tokens may still be live.
+# Checked where a token is trusted without a DB lookup (WebSocket handshake).
+_DISABLED_EMAILS: set = set()
+
+
+def set_user_disabled(email: str, disabled: bool) -> None:
+    """Record an admin enable/disable so token-only checks see it immediately."""
+    if disabled:
+        _DISABLED_EMAILS.add(email)
+    else:
+        _DISABLED_EMAILS.discard(email)
+
+
+def is_user_disabled(email: str) -> bool:
+    return email in _DISABLED_EMAILS
+
+
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+
+def chat_display_name(email: str, display_name: Optional[str], username: Optional[str]) -> str:
+    """Name shown in chat: display name, then username, then the email prefix."""
+    return display_name or username or email.split("@")[0]
+
+
+def _token_claims(email: str, role: UserRole, name: str) -> dict:
+    """Claims embedded in every access token we mint."""
+    return {"sub": email, "role": role.value, "name": name}
+
+
+def decode_token_claims(token: str) -> TokenData:
+    """
+    Verify a JWT and return its claims.
+    
+    Raises HTTPException 401 if the token is invalid or expired.
+    """
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
-        token_data = TokenData(email=email)
-    except JWTError:
-        raise credentials_exception
+        payload = decode_access_token(token)
+    except jwt.PyJWTError:
+        raise _credentials_exception()
+    # role is absent on tokens minted before role claims
+    return TokenData(email=payload["sub"], role=payload.get("role"))
+
+
+def _user_from_record(user: UserAuthView) -> User:
+    # Values come straight from our own DB, so skip Pydantic validation
+    return User.model_construct(
+        email=user.email,
+        disabled=user.disabled,
+        username=user.username,
+        display_name=user.display_name,
+        role=user.role.value,  # Convert enum to string
+        has_password=bool(user.hashed_password)
+    )
+
+
+# NOTE: Auth dependencies must stay `async def`. FastAPI runs sync dependencies
+# in the anyio thread pool, which we want to keep free for bcrypt work.
+async def get_current_user_from_token_claims(token: str = Depends(oauth2_scheme)) -> User:
+    """
+    Identify the caller from the JWT alone, without touching MongoDB.
+    
+    Only email and role are populated. The role reflects the moment the token
+    was minted; anything that authorizes on it must confirm against the user record.
+    """
+    token_data = decode_token_claims(token)
+    return User.model_construct(email=token_data.email, role=token_data.role or UserRole.USER.value)
+
+
+async def get_current_user(request: Request, token: str = Depends(oauth2_scheme)) -> User:
+    """
+    Validate JWT token and return current user.
+    
+    The resolved UserAuthView is also left on request.state.user_record so
+    handlers that need more than the User schema don't look the user up again.
+    
+    Raises HTTPException 401 if token is invalid or user doesn't exist.
+    """
+    token_data = decode_token_claims(token)
     
     user = await get_user_from_db(token_data.email)
     if user is None:
-        raise credentials_exception
+        raise _credentials_exception()
     
     # Check if user is disabled
     if user.disabled:
-        raise credentials_exception
+        raise _credentials_exception()
     
+    request.state.user_record = user
     # Convert to User schema for response
-    # Convert to User schema for response
-    return User(
-        email=user.email,
-        disabled=user.disabled,
-        username=user.username,
-        display_name=user.display_name,
-        role=user.role.value,  # Convert enum to string
-        has_password=bool(user.hashed_password)
-    )
+    return _user_from_record(user)
 
 
-async def get_current_admin(current_user: User = Depends(get_current_user)) -> User:
+async def get_current_admin(claims: User = Depends(get_current_user_from_token_claims)) -> User:
     """
     Dependency that ensures the current user is an admin.
     
-    Raises HTTPException 403 if user is not an admin.
+    The role claim is not trusted on its own: it is confirmed against the cached
+    user record, which every role change and disable invalidates. Promotions and
+    demotions therefore apply immediately instead of when the token expires.
+    
+    Raises HTTPException 401 if the account is gone or disabled,
+    403 if user is not an admin.
     """
-    if current_user.role != "admin":
+    user = await get_user_from_db(claims.email)
+    if user is None or user.disabled:
+        raise _credentials_exception()
+    
+    if user.role != UserRole.ADMIN:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Admin access required"
         )
-    return current_user
+    return _user_from_record(user)
 
 
 @router.post("/register", response_model=Token)
@@ -100,40 +223,46 @@ async def register(user: UserRegister):
         raise HTTPException(status_code=400, detail="Email already registered")
     
     # Hash password and create user document
-    hashed_password = get_password_hash(user.password)
+    # bcrypt is CPU-bound and releases the GIL, so run it off the event loop
+    hashed_password = await asyncio.to_thread(get_password_hash, user.password)
     
     # Generate sanitary and unique username from email prefix
-    base_username = user.email.split('@')[0].lower()
+    base_username = user.email.partition('@')[0].lower()
     # Remove special characters, keep alphanumeric
-    base_username = re.sub(r'[^a-z0-9]', '', base_username)
+    base_username = _USERNAME_STRIP.sub('', base_username)
     if not base_username:
         base_username = f"user{random.randint(1000, 9999)}"
         
-    # Ensure uniqueness
-    username = base_username
-    counter = 1
-    while await UserDocument.find_one(UserDocument.username == username):
-        username = f"{base_username}{counter}"
-        counter += 1
-    
-    display_name = username.title() if len(username) > 2 else "User"
-    
-    new_user = UserDocument(
-        email=user.email,
-        hashed_password=hashed_password,
-        disabled=False,
-        role=UserRole.USER,
-        username=username,
-        display_name=display_name
-    )
-    await new_user.insert()
+    # Atomic insert loop: the unique username index rejects collisions,
+    # so retry with a random suffix instead of probing with find_one
+    max_retries = 5
+    for attempt in range(max_retries):
+        username = base_username if attempt == 0 else f"{base_username}{secrets.randbelow(9000) + 1000}"
+        display_name = username.title() if len(username) > 2 else "User"
+        
+        new_user = UserDocument(
+            email=user.email,
+            hashed_password=hashed_password,
+            disabled=False,
+            role=UserRole.USER,
+            username=username,
+            display_name=display_name
+        )
+        try:
+            await new_user.insert()
+            break
+        except DuplicateKeyError as error:
+            if "email" in (error.details or {}).get("keyPattern", {}):
+                # Lost a race with a concurrent registration for the same email
+                raise HTTPException(status_code=400, detail="Email already registered")
+            if attempt == max_retries - 1:
+                raise HTTPException(status_code=500, detail="Failed to create user account (username collision)")
+    invalidate_user(new_user.email)
     
     # Generate and return access token
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
-    )
-    return {"access_token": access_token, "token_type": "bearer"}
+    name = chat_display_name(new_user.email, new_user.display_name, new_user.username)
+    access_token = create_access_token(data=_token_claims(new_user.email, new_user.role, name))
+    return Token.model_construct(access_token=access_token, token_type="bearer")
 
 
 @router.post("/login", response_model=Token)
@@ -142,18 +271,31 @@ async def login(user: UserLogin):
     Authenticate user and return JWT token.
     """
     user_in_db = await get_user_from_db(user.email)
-    if not user_in_db or not verify_password(user.password, user_in_db.hashed_password):
+    if not user_in_db or not user_in_db.hashed_password:
+        # Unknown or OAuth-only account: burn one bcrypt anyway to keep timing uniform
+        await asyncio.to_thread(_verify_dummy, user.password)
+        password_ok = False
+    else:
+        password_ok = await asyncio.to_thread(verify_password, user.password, user_in_db.hashed_password)
+    
+    if not password_ok:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user_in_db.email}, expires_delta=access_token_expires
-    )
-    return {"access_token": access_token, "token_type": "bearer"}
+    # Migrate legacy pbkdf2 hashes to bcrypt while we have the plain password
+    if needs_rehash(user_in_db.hashed_password):
+        new_hash = await asyncio.to_thread(get_password_hash, user.password)
+        await UserDocument.get_pymongo_collection().update_one(
+            {"email": user_in_db.email}, {"$set": {"hashed_password": new_hash}}
+        )
+        invalidate_user(user_in_db.email)
+    
+    name = chat_display_name(user_in_db.email, user_in_db.display_name, user_in_db.username)
+    access_token = create_access_token(data=_token_claims(user_in_db.email, user_in_db.role, name))
+    return Token.model_construct(access_token=access_token, token_type="bearer")
 
 
 @router.get("/me", response_model=User)
@@ -184,8 +326,8 @@ async def upgrade_to_admin(
             detail="Invalid admin key"
         )
     
-    # Get user document and update role
-    user_doc = await get_user_from_db(current_user.email)
+    # Get user document and update role (bypass cache, we're writing)
+    user_doc = await UserDocument.find_one(UserDocument.email == current_user.email)
     if not user_doc:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -194,6 +336,7 @@ async def upgrade_to_admin(
     
     user_doc.role = UserRole.ADMIN
     await user_doc.save()
+    invalidate_user(user_doc.email)
     
     return {"message": "Successfully upgraded to admin", "role": "admin"}
 
@@ -203,24 +346,35 @@ async def downgrade_to_user(current_user: User = Depends(get_current_user)):
     """
     Downgrade current admin to regular user role.
     """
-    user_doc = await get_user_from_db(current_user.email)
-    if not user_doc:
-        raise HTTPException(status_code=404, detail="User not found")
+    if current_user.role == UserRole.USER.value:
+        return {"message": "You are already a regular user", "role": "user"}
     
-    if user_doc.role == UserRole.USER:
+    # Demote atomically (the role filter makes concurrent downgrades of the
+    # same account a no-op), then check that another admin still exists.
+    collection = UserDocument.get_pymongo_collection()
+    demoted = await collection.find_one_and_update(
+        {"email": current_user.email, "role": UserRole.ADMIN.value},
+        {"$set": {"role": UserRole.USER.value}},
+        projection={"_id": 1}
+    )
+    if demoted is None:
         return {"message": "You are already a regular user", "role": "user"}
+    invalidate_user(current_user.email)
     
-    # Safeguard: Prevent the last admin from downgrading
-    admin_count = await UserDocument.find(UserDocument.role == UserRole.ADMIN).count()
-    if admin_count <= 1:
+    # Safeguard: Prevent the last admin from downgrading.
+    # If two admins downgrade at once both see zero and both roll back,
+    # so the collection never stays without an admin.
+    # limit=1: we only need to know whether any admin is left, not how many
+    admin_left = await collection.count_documents({"role": UserRole.ADMIN.value}, limit=1)
+    if not admin_left:
+        await collection.update_one({"_id": demoted["_id"]}, {"$set": {"role": UserRole.ADMIN.value}})
+        # A request in between may have cached the demoted role
+        invalidate_user(current_user.email)
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Cannot downgrade the last admin account. Promote another user first."
         )
     
-    user_doc.role = UserRole.USER
-    await user_doc.save()
-    
     return {"message": "Successfully downgraded to user", "role": "user"}
 
 
@@ -230,6 +384,34 @@ async def downgrade_to_user(current_user: User = Depends(get_current_user)):
 
 oauth = OAuth()
 
+
+class _SharedOAuthTransport(httpx.AsyncHTTPTransport):
+    """
+    Connection pool shared by every authlib client.
+    
+    authlib opens and closes a fresh httpx client for each provider call; this
+    transport ignores those per-client closes so TCP/TLS connections to
+    Google/GitHub stay alive between calls. close_oauth_transport() closes it
+    for real on shutdown.
+    """
+    async def __aexit__(self, *args) -> None:
+        pass
+    
+    async def aclose(self) -> None:
+        pass
+
+
+_oauth_transport = _SharedOAuthTransport(
+    http2=True,
+    limits=httpx.Limits(max_keepalive_connections=100, keepalive_expiry=60),
+)
+
+
+async def close_oauth_transport() -> None:
+    """Close the shared OAuth connection pool (call on app shutdown)."""
+    await httpx.AsyncHTTPTransport.aclose(_oauth_transport)
+
+
 # Validate Environment Variables
 # We don't want to start the app with broken auth configuration if possible,
 # or at least warn/fail on specific missing keys if we expect them to work.
@@ -247,7 +429,7 @@ if os.getenv('GOOGLE_CLIENT_ID') and os.getenv('GOOGLE_CLIENT_SECRET'):
         client_id=os.getenv('GOOGLE_CLIENT_ID'),
         client_secret=os.getenv('GOOGLE_CLIENT_SECRET'),
         server_metadata_url='https://accounts.google.com/.well-known/openid-configuration',
-        client_kwargs={'scope': 'openid email profile'}
+        client_kwargs={'scope': 'openid email profile', 'transport': _oauth_transport, 'timeout': 10}
     )
 
 # GitHub Configuration
@@ -259,7 +441,7 @@ if os.getenv('GITHUB_CLIENT_ID') and os.getenv('GITHUB_CLIENT_SECRET'):
         authorize_url='https://github.com/login/oauth/authorize',
         access_token_url='https://github.com/login/oauth/access_token',
         api_base_url='https://api.github.com/',
-        client_kwargs={'scope': 'user:email'}
+        client_kwargs={'scope': 'user:email', 'transport': _oauth_transport, 'timeout': 10}
     )
 
 
@@ -337,32 +519,37 @@ async def auth_callback(provider: str, request: Request):
         avatar_url = user_info.get('picture')
         
         if email:
-            username = email.split('@')[0]
+            username = email.partition('@')[0]
 
     elif provider == 'github':
-        # GitHub requires separate API calls
-        resp = await client.get('user', token=token)
+        # GitHub requires separate API calls. Most users keep their email private,
+        # so fetch the profile and the email list concurrently (one RTT instead of two)
+        resp, resp_emails = await asyncio.gather(
+            client.get('user', token=token),
+            client.get('user/emails', token=token),
+            return_exceptions=True
+        )
+        if isinstance(resp, Exception):
+            raise resp
         if resp.status_code != 200:
             print(f"GitHub API Error: {resp.status_code} {resp.text}")
             raise HTTPException(status_code=400, detail="Failed to fetch GitHub user")
             
         try:
-            user_info = resp.json()
-        except ValueError:
+            user_info = orjson.loads(resp.content)
+        except ValueError:  # orjson.JSONDecodeError subclasses ValueError
             raise HTTPException(status_code=400, detail="Invalid response from GitHub")
         
         # Get email (might be private)
         email = user_info.get('email')
-        if not email:
-            resp_emails = await client.get('user/emails', token=token)
-            if resp_emails.status_code == 200:
-                try:
-                    for e in resp_emails.json():
-                        if e.get('primary') and e.get('verified'):
-                            email = e['email']
-                            break
-                except ValueError:
-                    pass # Ignore if email list is unparseable
+        if not email and not isinstance(resp_emails, Exception) and resp_emails.status_code == 200:
+            try:
+                for e in orjson.loads(resp_emails.content):
+                    if e.get('primary') and e.get('verified'):
+                        email = e['email']
+                        break
+            except ValueError:
+                pass # Ignore if email list is unparseable
         
         username = user_info.get('login')
         display_name = user_info.get('name') or username
@@ -372,76 +559,71 @@ async def auth_callback(provider: str, request: Request):
         raise HTTPException(status_code=400, detail="Could not retrieve email from provider")
 
     # --- DB LOGIC ---
-    user_doc = await UserDocument.find_one(UserDocument.email == email)
-    
-    is_new_user = False
+    # Prepare base username (only used if this login creates the account)
+    base_username = username or email.partition('@')[0]
+    base_username = _USERNAME_STRIP.sub('', base_username.lower())
+    if not base_username: 
+        base_username = "user"
     
-    if not user_doc:
-        # Create new user
-        is_new_user = True
+    # Single upsert: $setOnInsert only applies when the account doesn't exist yet,
+    # so returning users cost one round-trip instead of find + save.
+    collection = UserDocument.get_pymongo_collection()
+    existing = None
+    max_retries = 5
+    for attempt in range(max_retries):
+        if attempt == 0:
+            final_username = base_username
+        else:
+            # Append random suffix on collision
+            final_username = f"{base_username}{random.randint(100, 9999)}"
         
-        # Prepare base username
-        base_username = username or email.split('@')[0]
-        base_username = re.sub(r'[^a-z0-9]', '', base_username.lower())
-        if not base_username: 
-            base_username = "user"
+        new_user = UserDocument(
+            email=email,
+            username=final_username,
+            display_name=display_name,
+            avatar_url=avatar_url,
+            provider=provider,
+            role=UserRole.USER,
+            disabled=False,
+            hashed_password=None # Explicitly None for OAuth users
+        )
+        insert_fields = new_user.model_dump(exclude={"id", "revision_id", "email"})
+        insert_fields["role"] = UserRole.USER.value
         
-        # Atomic Insert Loop (Race Condition Handling)
-        max_retries = 5
-        for attempt in range(max_retries):
-            try:
-                if attempt == 0:
-                    final_username = base_username
-                else:
-                    # Append random suffix on collision
-                    final_username = f"{base_username}{random.randint(100, 9999)}"
-                
-                new_user = UserDocument(
-                    email=email,
-                    username=final_username,
-                    display_name=display_name,
-                    avatar_url=avatar_url,
-                    provider=provider,
-                    role=UserRole.USER,
-                    disabled=False,
-                    hashed_password=None # Explicitly None for OAuth users
-                )
-                await new_user.insert()
-                user_doc = new_user
-                break # Success!
-            except DuplicateKeyError as error:
-                # Check which key caused the error (email or username)
-                # Beanie/PyMongo errors usually have details, but structure can vary.
-                # Common pattern: "E11000 duplicate key error collection: ... index: email_1 ..."
-                error_msg = str(error)
-                
-                if "email" in error_msg or "email_1" in error_msg:
-                    # Email collision -> Account already exists
-                    # Ideally we should link accounts, but for now just fail or log
-                    print(f"User with email {email} already exists (Race Condition)")
-                    # We can try to fetch the existing user if that was the case
-                    user_doc = await UserDocument.find_one(UserDocument.email == email)
-                    if user_doc:
-                         break # Treat as success (logged in)
-                    else:
-                         raise HTTPException(status_code=400, detail="Email already registered")
-
-                # If it's not email, it must be username collision -> Retry
-                if attempt == max_retries - 1:
-                    print(f"Failed to generate unique username for {email}")
-                    raise HTTPException(status_code=500, detail="Failed to create user account (username collision)")
-                continue # Retry with new suffix
+        try:
+            existing = await collection.find_one_and_update(
+                {"email": email},
+                {"$setOnInsert": insert_fields},
+                upsert=True,
+                projection={"avatar_url": 1, "role": 1, "display_name": 1, "username": 1},
+                return_document=ReturnDocument.BEFORE
+            )
+            break # Success!
+        except DuplicateKeyError as error:
+            if "email" in (error.details or {}).get("keyPattern", {}):
+                # Concurrent first login for the same email (Race Condition);
+                # retrying the upsert will now match the existing account
+                print(f"User with email {email} already exists (Race Condition)")
+            elif attempt == max_retries - 1:
+                print(f"Failed to generate unique username for {email}")
+                raise HTTPException(status_code=500, detail="Failed to create user account (username collision)")
+            continue # Retry
     else:
-        # Update avatar/provider if missing (optional)
-        if not user_doc.avatar_url and avatar_url:
-            user_doc.avatar_url = avatar_url
-            await user_doc.save()
+        raise HTTPException(status_code=500, detail="Failed to create user account")
+    
+    # BEFORE document is None only when the upsert inserted a new account
+    is_new_user = existing is None
+    if is_new_user:
+        invalidate_user(email)
+    elif not existing.get("avatar_url") and avatar_url:
+        # Update avatar if missing (optional)
+        await collection.update_one({"_id": existing["_id"]}, {"$set": {"avatar_url": avatar_url}})
+        invalidate_user(email)
 
     # Create JWT
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user_doc.email}, expires_delta=access_token_expires
-    )
+    account = existing or insert_fields
+    name = chat_display_name(email, account.get("display_name"), account.get("username"))
+    access_token = create_access_token(data=_token_claims(email, UserRole(account.get("role", UserRole.USER.value)), name))
     
     # Redirect to Frontend Callback Handler matching the plan
     # frontend_url/auth/callback?token=...&new_user=true
@@ -1,7 +1,10 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from typing import Optional
 
 class User(BaseModel):
+    # Built with model_construct from trusted DB data on every request, so keep it immutable
+    model_config = ConfigDict(frozen=True, extra='forbid')
+
     email: str
     disabled: Optional[bool] = None
     username: Optional[str] = None
@@ -9,9 +12,6 @@ class User(BaseModel):
     role: str = "user"  # user or admin
     has_password: bool = False  # New field to indicate if user has a password set
 
-class UserInDB(User):
-    hashed_password: Optional[str] = None
-
 class UserRegister(BaseModel):
     email: str
     password: str
@@ -26,6 +26,7 @@ class Token(BaseModel):
 
 class TokenData(BaseModel):
     email: Optional[str] = None
+    role: Optional[str] = None
 
 class PasswordChange(BaseModel):
     """Schema for password change request."""
@@ -1,7 +1,10 @@
-from passlib.context import CryptContext
-from datetime import datetime, timedelta, timezone
-from jose import jwt
+import bcrypt
+from datetime import timedelta
+import jwt
+from cachetools import TTLCache
 import os
+import time
+import hashlib
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -11,6 +14,10 @@ load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY", "CHANGE_THIS_TO_A_SECURE_RANDOM_STRING_IN_PRODUCTION")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+ACCESS_TOKEN_EXPIRE_SECONDS = ACCESS_TOKEN_EXPIRE_MINUTES * 60
+
+# Our tokens are a few hundred bytes; anything far larger is rejected before decoding
+MAX_TOKEN_LENGTH = 4096
 
 # Debug mode - defaults to FALSE for security (opt-in)
 DEBUG = os.getenv("DEBUG", "false").lower() == "true"
@@ -25,22 +32,84 @@ if not DEBUG:
     if not ADMIN_KEY or ADMIN_KEY == "supersecretadminkey123":
         raise ValueError("ADMIN_KEY must be set to a secure value in production! Generate with: openssl rand -hex 32")
 
-pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
+# JWT parameters resolved once instead of rebuilt on every encode/decode
+_JWT_KEY = SECRET_KEY.encode()
+_JWT_ALGORITHMS = [ALGORITHM]
+_JWT_HEADERS = {"typ": "JWT", "alg": ALGORITHM}
+_JWT_DECODE_OPTIONS = {"require": ["exp", "sub"], "verify_signature": True, "verify_exp": True}
+
+# bcrypt cost factor - tune so a hash takes roughly 250-500ms on production hardware
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+# Accounts created before the bcrypt switch still carry passlib pbkdf2_sha256 hashes.
+# passlib is only imported the first time such a hash is seen.
+LEGACY_HASH_PREFIX = "$pbkdf2-sha256$"
+_legacy_pwd_context = None
+
+def _verify_legacy_password(plain_password, hashed_password):
+    global _legacy_pwd_context
+    if _legacy_pwd_context is None:
+        from passlib.context import CryptContext
+        _legacy_pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
+    return _legacy_pwd_context.verify(plain_password, hashed_password)
+
+def needs_rehash(hashed_password):
+    """True if the stored hash predates bcrypt and should be upgraded on next login."""
+    return hashed_password.startswith(LEGACY_HASH_PREFIX)
 
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    if hashed_password.startswith(LEGACY_HASH_PREFIX):
+        return _verify_legacy_password(plain_password, hashed_password)
+    # bcrypt only looks at the first 72 bytes of the password
+    return bcrypt.checkpw(plain_password.encode()[:72], hashed_password.encode())
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    hashed = bcrypt.hashpw(password.encode()[:72], bcrypt.gensalt(rounds=BCRYPT_ROUNDS))
+    return hashed.decode()
+
+# Tokens minted within the same 30s window share an exp, which makes the payload
+# deterministic and lets us reuse the signed token (e.g. repeated logins, retries)
+# No invalidation is needed on password change: re-signing the same claims within
+# the window would produce a byte-identical token anyway.
+TOKEN_EXP_BUCKET_SECONDS = 30
+_signed_token_cache: TTLCache = TTLCache(maxsize=10_000, ttl=TOKEN_EXP_BUCKET_SECONDS)
 
 def create_access_token(data: dict, expires_delta: timedelta = None):
-    to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.now(timezone.utc) + expires_delta
-    else:
-        # Use configured expiry time from environment
-        expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    # Use configured expiry time from environment unless overridden
+    lifetime = ACCESS_TOKEN_EXPIRE_SECONDS if expires_delta is None else int(expires_delta.total_seconds())
+    # Round issue time down so tokens never outlive the configured lifetime
+    bucket = int(time.time()) // TOKEN_EXP_BUCKET_SECONDS * TOKEN_EXP_BUCKET_SECONDS
+    cache_key = (tuple(sorted(data.items())), lifetime, bucket)
     
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    encoded_jwt = _signed_token_cache.get(cache_key)
+    if encoded_jwt is None:
+        to_encode = data.copy()
+        # JWT exp is plain epoch seconds
+        to_encode["exp"] = bucket + lifetime
+        encoded_jwt = jwt.encode(to_encode, _JWT_KEY, algorithm=ALGORITHM, headers=_JWT_HEADERS)
+        _signed_token_cache[cache_key] = encoded_jwt
     return encoded_jwt
+
+# Verified token claims: blake2b(token) -> payload
+# exp is re-checked on every hit, so a cached entry never outlives its token
+_decoded_token_cache: TTLCache = TTLCache(maxsize=4096, ttl=15)
+
+def decode_access_token(token: str) -> dict:
+    """
+    Verify an access token and return its claims (cached for ~15s per token).
+    
+    The returned dict is shared between callers and must not be mutated.
+    Raises jwt.PyJWTError if the token is invalid, expired or oversized.
+    """
+    # Cheap size check first: oversized tokens would cost us hashing and base64 work
+    if len(token) > MAX_TOKEN_LENGTH:
+        raise jwt.InvalidTokenError("Token too large")
+    
+    key = hashlib.blake2b(token.encode(), digest_size=16).digest()
+    claims = _decoded_token_cache.get(key)
+    if claims is None or claims["exp"] <= time.time():
+        claims = jwt.decode(
+            token, _JWT_KEY, algorithms=_JWT_ALGORITHMS, leeway=0, options=_JWT_DECODE_OPTIONS
+        )
+        _decoded_token_cache[key] = claims
+    return claims
@@ -2,24 +2,25 @@ import datetime
 import time
 import os
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, Depends
+from fastapi import FastAPI, Depends, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.sessions import SessionMiddleware
-import uvicorn
 from dotenv import load_dotenv
 
-from auth.router import router as auth_router, get_current_admin
+from auth.router import router as auth_router, get_current_admin, close_oauth_transport
 from auth.schemas import User
 from routers.dashboard import router as dashboard_router
 from routers.chat import router as chat_router
 from routers.profile import router as profile_router
 from routers.admin import router as admin_router
-from globalchat.main import router as globalchat_router
+from globalchat.main import router as globalchat_router, manager as chat_manager, message_writer
 from database.connection import init_db, close_db
 from database.models import UserDocument
+from pymongo import ReturnDocument
 
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import HTMLResponse
+from utils.responses import ORJSONResponse
 from pydantic import BaseModel
 
 # Load environment variables
@@ -31,8 +32,14 @@ async def lifespan(app: FastAPI):
     """Application lifespan - handles startup and shutdown events."""
     # Startup
     await init_db()
+    app.state.html_cache = load_html_pages()
+    chat_manager.start()
+    message_writer.start()
     yield
     # Shutdown
+    await chat_manager.stop()
+    await message_writer.stop()
+    await close_oauth_transport()
     await close_db()
 
 
@@ -40,7 +47,8 @@ app = FastAPI(
     title="CodeChicks API",
     description="FastAPI backend with auth, dashboard, and global chat",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # --- CORS Middleware ---
@@ -50,7 +58,8 @@ if cors_origins == "*":
     # Credentials not allowed with wildcard origin for security
     allow_credentials = False
 else:
-    origins = [origin.strip() for origin in cors_origins.split(",")]
+    # frozenset so CORSMiddleware's per-request origin check is a hash lookup
+    origins = frozenset(origin.strip() for origin in cors_origins.split(",") if origin.strip())
     allow_credentials = True
 
 app.add_middleware(
@@ -81,12 +90,34 @@ from pathlib import Path
 # Base directory for absolute paths
 BASE_DIR = Path(__file__).resolve().parent
 
+# Frontend pages: route path -> HTML file, read once at startup
+PAGE_ROUTES = {
+    "/": "static/login/login.html",
+    "/clock": "static/clock/index.html",
+    "/register": "static/login/register.html",
+    "/dashboard": "static/dashboard/index.html",
+    "/chat": "static/globalchat_ui/index.html",
+    "/onboarding": "static/onboarding/index.html",
+    "/settings": "static/settings/index.html",
+    "/admin": "static/admin/index.html",
+}
+
+def load_html_pages() -> dict[str, bytes]:
+    """Read every known HTML page into memory (missing files are skipped)"""
+    cache = {}
+    for file_path in PAGE_ROUTES.values():
+        full_path = BASE_DIR / file_path
+        if full_path.is_file():
+            cache[file_path] = full_path.read_bytes()
+    return cache
+
 def serve_html(file_path: str):
-    """Helper to serve HTML files with correct path resolution"""
-    full_path = BASE_DIR / file_path
-    if not full_path.exists():
+    """Helper to serve HTML pages from the startup cache"""
+    content = app.state.html_cache.get(file_path)
+    if content is None:
         return HTMLResponse(content="<h1>404 - Page Not Found</h1>", status_code=404)
-    return HTMLResponse(full_path.read_text(encoding="utf-8"))
+    # Already-encoded bytes are sent as-is
+    return HTMLResponse(content)
 
 # Update static mount to use absolute path
 app.mount("/static", StaticFiles(directory=str(BASE_DIR / "static")), name="static")
@@ -96,6 +127,8 @@ app.mount("/static", StaticFiles(directory=str(BASE_DIR / "static")), name="stat
 
 # NOTE: We removed the global TimerState class. 
 # State is now stored in the UserDocument in MongoDB.
+# Every timer endpoint is a single atomic round-trip (pipeline update or projection),
+# so a separate store such as Redis would add a second source of truth for little gain.
 
 from auth.router import get_current_user
 
@@ -103,109 +136,118 @@ class TimerResponse(BaseModel):
     elapsed_time: int  # in milliseconds
     is_running: bool
 
-@app.post("/api/start", response_model=TimerResponse)
-async def start_timer(current_user: User = Depends(get_current_user)):
-    # Fetch latest user state from DB
-    user_doc = await UserDocument.find_one(UserDocument.email == current_user.email)
-    if not user_doc:
+# Handlers return ORJSONResponse directly (skipping response-model validation);
+# the model is still documented in the OpenAPI schema
+TIMER_RESPONSES = {200: {"model": TimerResponse}}
+
+# The responses only need the accumulated time back from the update
+TIMER_PROJECTION = {"_id": 0, "timer_elapsed_time": 1}
+
+# Timer fields with the model defaults, for pipelines run on raw documents
+# (accounts created before the timer fields existed don't store them)
+TIMER_IS_RUNNING = {"$ifNull": ["$timer_is_running", False]}
+TIMER_START_TIME = {"$ifNull": ["$timer_start_time", 0.0]}
+TIMER_ELAPSED_TIME = {"$ifNull": ["$timer_elapsed_time", 0.0]}
+
+async def update_timer(email: str, pipeline: list) -> dict:
+    """
+    Apply a timer update pipeline and return the updated timer fields.
+    
+    get_current_user has already confirmed the account exists, so there is no
+    separate lookup; the update itself doubles as the existence check.
+    """
+    timer = await UserDocument.get_pymongo_collection().find_one_and_update(
+        {"email": email},
+        pipeline,
+        projection=TIMER_PROJECTION,
+        return_document=ReturnDocument.AFTER
+    )
+    if not timer:
         raise HTTPException(status_code=404, detail="User not found")
+    return timer
 
-    if not user_doc.timer_is_running:
-        user_doc.timer_start_time = time.time()
-        user_doc.timer_is_running = True
-        await user_doc.save()
+@app.post("/api/start", responses=TIMER_RESPONSES)
+async def start_timer(current_user: User = Depends(get_current_user)):
+    # Single round-trip: start the timer only if it isn't already running
+    # (the $cond sees the pre-update value of timer_is_running)
+    now = time.time()
+    timer = await update_timer(current_user.email, [{"$set": {
+        "timer_start_time": {"$cond": [TIMER_IS_RUNNING, TIMER_START_TIME, now]},
+        "timer_elapsed_time": TIMER_ELAPSED_TIME,
+        "timer_is_running": True
+    }}])
     
     # Return total accumulated time
-    total_ms = int(user_doc.timer_elapsed_time * 1000)
-    return TimerResponse(elapsed_time=total_ms, is_running=True)
+    total_ms = int(timer.get("timer_elapsed_time", 0.0) * 1000)
+    return ORJSONResponse({"elapsed_time": total_ms, "is_running": True})
 
-@app.post("/api/stop", response_model=TimerResponse)
+@app.post("/api/stop", responses=TIMER_RESPONSES)
 async def stop_timer(current_user: User = Depends(get_current_user)):
-    user_doc = await UserDocument.find_one(UserDocument.email == current_user.email)
-    if not user_doc:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    if user_doc.timer_is_running:
-        # Calculate session duration
-        now = time.time()
-        run_duration = now - user_doc.timer_start_time
-        
-        # Update state
-        user_doc.timer_elapsed_time += run_duration
-        user_doc.timer_is_running = False
-        user_doc.timer_start_time = 0.0
-        await user_doc.save()
-
-    total_ms = int(user_doc.timer_elapsed_time * 1000)
-    return TimerResponse(elapsed_time=total_ms, is_running=False)
-
-@app.post("/api/reset", response_model=TimerResponse)
+    # Single round-trip: fold the running session into the accumulated time
+    now = time.time()
+    timer = await update_timer(current_user.email, [{"$set": {
+        "timer_elapsed_time": {"$cond": [
+            TIMER_IS_RUNNING,
+            {"$add": [TIMER_ELAPSED_TIME, {"$subtract": [now, TIMER_START_TIME]}]},
+            TIMER_ELAPSED_TIME
+        ]},
+        "timer_is_running": False,
+        "timer_start_time": 0.0
+    }}])
+
+    total_ms = int(timer.get("timer_elapsed_time", 0.0) * 1000)
+    return ORJSONResponse({"elapsed_time": total_ms, "is_running": False})
+
+@app.post("/api/reset", responses=TIMER_RESPONSES)
 async def reset_timer(current_user: User = Depends(get_current_user)):
-    user_doc = await UserDocument.find_one(UserDocument.email == current_user.email)
-    if not user_doc:
+    result = await UserDocument.get_pymongo_collection().update_one(
+        {"email": current_user.email},
+        {"$set": {"timer_start_time": 0.0, "timer_elapsed_time": 0.0, "timer_is_running": False}}
+    )
+    if not result.matched_count:
         raise HTTPException(status_code=404, detail="User not found")
 
-    user_doc.timer_start_time = 0.0
-    user_doc.timer_elapsed_time = 0.0
-    user_doc.timer_is_running = False
-    await user_doc.save()
-
-    return TimerResponse(elapsed_time=0, is_running=False)
+    return ORJSONResponse({"elapsed_time": 0, "is_running": False})
 
-@app.get("/api/status", response_model=TimerResponse)
+@app.get("/api/status", responses=TIMER_RESPONSES)
 async def get_timer_status(current_user: User = Depends(get_current_user)):
-    user_doc = await UserDocument.find_one(UserDocument.email == current_user.email)
-    if not user_doc:
+    # Let MongoDB compute the running total so only two scalars come back
+    now = time.time()
+    docs = await UserDocument.aggregate([
+        {"$match": {"email": current_user.email}},
+        {"$limit": 1},
+        {"$project": {
+            "_id": 0,
+            "elapsed": {"$add": [
+                TIMER_ELAPSED_TIME,
+                {"$cond": [TIMER_IS_RUNNING, {"$subtract": [now, TIMER_START_TIME]}, 0]}
+            ]},
+            "is_running": TIMER_IS_RUNNING
+        }}
+    ]).to_list(1)
+    if not docs:
          # Fallback for unauthed (shouldn't happen due to dependency) or error
-         return TimerResponse(elapsed_time=0, is_running=False)
+         return ORJSONResponse({"elapsed_time": 0, "is_running": False})
 
-    total_elapsed = user_doc.timer_elapsed_time
-    if user_doc.timer_is_running:
-        total_elapsed += (time.time() - user_doc.timer_start_time)
-    
-    return TimerResponse(
-        elapsed_time=int(total_elapsed * 1000), 
-        is_running=user_doc.timer_is_running
-    )
+    timer = docs[0]
+    return ORJSONResponse({
+        "elapsed_time": int(timer.get("elapsed", 0.0) * 1000),
+        "is_running": timer.get("is_running", False)
+    })
 
 # NOTE: /api/dashboard is now handled by routers/dashboard.py with auth protection
-@app.get("/", response_class=HTMLResponse)
-async def root():
-    return serve_html("static/login/login.html")
-
-@app.get("/clock", response_class=HTMLResponse)
-async def clock_page():
-    return serve_html("static/clock/index.html")
-
-@app.get("/register", response_class=HTMLResponse)
-async def register_page():
-    return serve_html("static/login/register.html")
-
-@app.get("/dashboard", response_class=HTMLResponse)
-async def dashboard_page():
-    """Serve dashboard UI (mockup)"""
-    return serve_html("static/dashboard/index.html")
-
-@app.get("/chat", response_class=HTMLResponse)
-async def chat_page():
-    """Serve chat UI (mockup)"""
-    return serve_html("static/globalchat_ui/index.html")
-
-@app.get("/onboarding", response_class=HTMLResponse)
-async def onboarding_page():
-    """Serve onboarding UI (mockup)"""
-    return serve_html("static/onboarding/index.html")
-
-@app.get("/settings", response_class=HTMLResponse)
-async def settings_page():
-    """Serve settings UI"""
-    return serve_html("static/settings/index.html")
-
-@app.get("/admin", response_class=HTMLResponse)
-async def admin_page():
-    """Serve admin panel UI"""
-    return serve_html("static/admin/index.html")
+
+# Pages are plain Starlette routes: no dependencies or response model to resolve
+def page_endpoint(file_path: str):
+    async def endpoint(request):
+        return serve_html(file_path)
+    return endpoint
+
+for route_path, file_path in PAGE_ROUTES.items():
+    app.add_route(route_path, page_endpoint(file_path), methods=["GET"], include_in_schema=False)
 
 if __name__ == "__main__":
+    # Only needed when run directly; Vercel and `uvicorn clock_:app` never import it here
+    import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
 
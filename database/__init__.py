@@ -1,5 +1,5 @@
 # Database package
 from database.connection import init_db
-from database.models import UserDocument, MessageDocument
+from database.models import UserDocument, UserAuthView, UserProfileView, UserListView, MessageDocument, MessageView
 
-__all__ = ["init_db", "UserDocument", "MessageDocument"]
+__all__ = ["init_db", "UserDocument", "UserAuthView", "UserProfileView", "UserListView", "MessageDocument", "MessageView"]
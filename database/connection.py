@@ -5,7 +5,8 @@ Provides database initialization and connection management using Beanie ODM.
 """
 
 from beanie import init_beanie
-from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import AsyncMongoClient
+import asyncio
 import os
 import certifi
 from dotenv import load_dotenv
@@ -14,7 +15,11 @@ from dotenv import load_dotenv
 load_dotenv()
 
 # MongoDB client instance (reusable)
-_client: AsyncIOMotorClient = None
+_client: AsyncMongoClient = None
+
+# Connection pool sizing
+MONGODB_MAX_POOL_SIZE = int(os.getenv("MONGODB_MAX_POOL_SIZE", "50"))
+MONGODB_MIN_POOL_SIZE = int(os.getenv("MONGODB_MIN_POOL_SIZE", "10"))
 
 
 async def init_db():
@@ -27,6 +32,7 @@ async def init_db():
     
     # Import models here to avoid circular imports
     from database.models import UserDocument, MessageDocument
+    from database.migrations import dedupe_usernames
     
     mongodb_uri = os.getenv("MONGODB_URI", "mongodb://127.0.0.1:27017")
     database_name = os.getenv("DATABASE_NAME", "codechicks")
@@ -34,17 +40,30 @@ async def init_db():
     try:
         # Add serverSelectionTimeoutMS for faster failure detection
         # Use certifi for SSL certificate verification (fixes macOS issues with MongoDB Atlas)
-        _client = AsyncIOMotorClient(
+        # PyMongo's native async client: no thread-pool hop per operation, unlike Motor
+        _client = AsyncMongoClient(
             mongodb_uri,
             tlsCAFile=certifi.where(),
             serverSelectionTimeoutMS=5000,  # 5 second timeout
             connectTimeoutMS=5000,
-            socketTimeoutMS=5000
+            socketTimeoutMS=5000,
+            maxPoolSize=MONGODB_MAX_POOL_SIZE,
+            minPoolSize=MONGODB_MIN_POOL_SIZE,
+            # Compress replies on the wire; zlib is the fallback if zstandard isn't installed
+            compressors="zstd,zlib"
         )
         
         # Test the connection
         await _client.admin.command('ping')
         
+        # Warm the pool with a few concurrent pings so the first requests don't pay for the handshakes
+        await asyncio.gather(*(
+            _client.admin.command('ping') for _ in range(max(1, MONGODB_MAX_POOL_SIZE // 5))
+        ))
+        
+        # Must run before init_beanie builds the unique username index
+        await dedupe_usernames(_client[database_name])
+        
         await init_beanie(
             database=_client[database_name],
             document_models=[UserDocument, MessageDocument]
@@ -65,11 +84,11 @@ async def close_db():
     """
     global _client
     if _client:
-        _client.close()
+        await _client.close()
         _client = None  # Prevent reuse of closed connection
         print("🔌 MongoDB connection closed")
 
 
-def get_client() -> AsyncIOMotorClient:
+def get_client() -> AsyncMongoClient:
     """Get the MongoDB client instance."""
     return _client
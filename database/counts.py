@@ -0,0 +1,28 @@
+"""
+Document Count Helpers
+
+Counts shown on dashboards and status pages. Exact counts walk the index on
+every call, so these trade a few seconds of staleness for cheap reads.
+"""
+
+from beanie import Document
+from cachetools import TTLCache
+
+from database.models import MessageDocument
+
+# Filtered counts: name -> value (refreshed at most every 5 seconds)
+_COUNT_CACHE: TTLCache = TTLCache(maxsize=16, ttl=5)
+
+
+async def estimated_count(document: type[Document]) -> int:
+    """Total documents in a collection, read from collection metadata (no scan)."""
+    return await document.get_pymongo_collection().estimated_document_count()
+
+
+async def live_message_count() -> int:
+    """Number of messages that have not been deleted (cached for 5 seconds)."""
+    count = _COUNT_CACHE.get("live_messages")
+    if count is None:
+        count = await MessageDocument.find(MessageDocument.is_deleted == False).count()
+        _COUNT_CACHE["live_messages"] = count
+    return count
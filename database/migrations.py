@@ -0,0 +1,48 @@
+"""
+One-off Data Migrations
+
+Fixes existing data that a newer index would otherwise reject. These run from
+init_db before Beanie builds the indexes, and skip themselves once the index
+they prepare for exists.
+"""
+
+from pymongo.asynchronous.database import AsyncDatabase
+
+
+async def dedupe_usernames(database: AsyncDatabase) -> int:
+    """
+    Rename duplicate usernames so the unique username index can be built.
+
+    Before the index existed, the OAuth callback stored the provider login as
+    the username without checking it was free, so older databases can hold
+    several accounts with the same username. The oldest account keeps it; the
+    others get the first free numeric suffix (alice -> alice2, alice3, ...).
+
+    Returns:
+        int: Number of accounts renamed (0 once the index exists)
+    """
+    users = database["users"]
+    if "username_1" in await users.index_information():
+        return 0
+
+    cursor = await users.aggregate([
+        # Same documents the partial index covers
+        {"$match": {"username": {"$type": "string"}}},
+        {"$sort": {"_id": 1}},
+        {"$group": {"_id": "$username", "ids": {"$push": "$_id"}, "n": {"$sum": 1}}},
+        {"$match": {"n": {"$gt": 1}}},
+    ])
+    renamed = 0
+    for duplicate in await cursor.to_list(None):
+        username = duplicate["_id"]
+        suffix = 2
+        for user_id in duplicate["ids"][1:]:
+            while await users.find_one({"username": f"{username}{suffix}"}, {"_id": 1}):
+                suffix += 1
+            await users.update_one({"_id": user_id}, {"$set": {"username": f"{username}{suffix}"}})
+            suffix += 1
+            renamed += 1
+
+    if renamed:
+        print(f"⚠️ Renamed {renamed} account(s) with a duplicate username")
+    return renamed
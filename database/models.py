@@ -5,8 +5,9 @@ Defines MongoDB document schemas using Beanie ODM.
 These models extend Pydantic BaseModel and provide MongoDB integration.
 """
 
-from beanie import Document, Indexed
-from pydantic import Field
+from beanie import Document, Indexed, PydanticObjectId
+from pymongo import IndexModel
+from pydantic import BaseModel, Field
 from datetime import datetime
 from typing import Optional
 from enum import Enum
@@ -26,15 +27,15 @@ class UserDocument(Document):
     Stores user authentication data and profile information.
     """
     # Auth fields
-    email: Indexed(str, unique=True)
+    email: Indexed(str, unique=True)  # Unique index backs every per-request lookup by email
     hashed_password: Optional[str] = None
     disabled: bool = False
     
     # Role-based access control
     role: UserRole = UserRole.USER
     
-    # Profile fields - sparse index allows multiple None values
-    username: Optional[Indexed(str, unique=True, sparse=True)] = None
+    # Profile fields - unique username index is declared in Settings
+    username: Optional[str] = None
     display_name: Optional[str] = None
     provider: str = "local"  # local, google, github
     age: Optional[int] = None
@@ -55,12 +56,26 @@ class UserDocument(Document):
     
     class Settings:
         name = "users"
+        indexes = [
+            # Declared here because Beanie ignores Indexed() wrapped in Optional[...]
+            # Partial index: only string usernames are indexed, so any number of
+            # documents can have a missing or null username. Existing duplicate
+            # string usernames are renamed by database.migrations before it is built
+            IndexModel(
+                "username", unique=True,
+                partialFilterExpression={"username": {"$exists": True, "$type": "string"}}
+            ),
+            # Admin counts (last-admin safeguard, admin stats)
+            IndexModel("role"),
+            # New-user counts (admin stats)
+            IndexModel("created_at"),
+        ]
     
     class Config:
         json_schema_extra = {
             "example": {
                 "email": "user@example.com",
-                "hashed_password": "$pbkdf2-sha256$...",
+                "hashed_password": "$2b$12$...",
                 "disabled": False,
                 "role": "user",
                 "username": "cooluser",
@@ -70,19 +85,66 @@ class UserDocument(Document):
         }
 
 
+class UserAuthView(BaseModel):
+    """
+    Projection of UserDocument used on the authentication hot path.
+    
+    Carries only the fields needed to authorize a request and log in.
+    """
+    email: str
+    hashed_password: Optional[str] = None
+    disabled: bool = False
+    role: UserRole = UserRole.USER
+    username: Optional[str] = None
+    display_name: Optional[str] = None
+    avatar_url: Optional[str] = None
+
+
+class UserProfileView(BaseModel):
+    """
+    Projection of UserDocument for the profile endpoints.
+    
+    Mirrors ProfileResponse; credentials and timer state are never read.
+    """
+    email: str
+    username: Optional[str] = None
+    display_name: Optional[str] = None
+    age: Optional[int] = None
+    bio: Optional[str] = None
+    avatar_url: Optional[str] = None
+    profile_complete: bool = False
+    created_at: Optional[datetime] = None
+
+
+class UserListView(BaseModel):
+    """
+    Projection of UserDocument for the admin user list.
+    
+    Leaves out credentials, profile text and timer state.
+    """
+    email: str
+    username: Optional[str] = None
+    display_name: Optional[str] = None
+    role: UserRole = UserRole.USER
+    disabled: bool = False
+    profile_complete: bool = False
+    created_at: Optional[datetime] = None
+
+
 class MessageDocument(Document):
     """
     Chat message document model for MongoDB.
     
     Stores chat messages with sender info, content, and metadata.
     """
-    sender_id: Indexed(str)  # User email
+    sender_id: str  # User email
     sender_name: Optional[str] = None
     content: str
-    timestamp: Indexed(datetime, index_type=-1) = Field(default_factory=now_ist)
-    room_id: Indexed(str) = "global"
+    timestamp: datetime = Field(default_factory=now_ist)
+    room_id: str = "global"
     message_type: str = "text"  # text, system, etc.
     is_deleted: bool = False
+    updated_at: Optional[datetime] = None  # Set when the content is edited
     
     # Reply functionality
     reply_to_id: Optional[str] = None
@@ -92,6 +154,15 @@ class MessageDocument(Document):
     
     class Settings:
         name = "messages"
+        indexes = [
+            # Chat history: equality on room/is_deleted, newest first, so the sort comes from the index
+            IndexModel(
+                [("room_id", 1), ("is_deleted", 1), ("timestamp", -1)],
+                name="room_del_ts"
+            ),
+            # Per-user message counts (dashboard)
+            IndexModel([("sender_id", 1), ("is_deleted", 1)], name="sender_del"),
+        ]
     
     class Config:
         json_schema_extra = {
@@ -103,3 +174,21 @@ class MessageDocument(Document):
                 "message_type": "text"
             }
         }
+
+
+class MessageView(BaseModel):
+    """
+    Projection of MessageDocument for chat history pages.
+    
+    Everything a MessageResponse needs, without moderation flags.
+    """
+    id: PydanticObjectId = Field(alias="_id")
+    sender_id: str
+    sender_name: Optional[str] = None
+    content: str
+    timestamp: datetime
+    room_id: str = "global"
+    message_type: str = "text"
+    reply_to_id: Optional[str] = None
+    reply_to_username: Optional[str] = None
+    reply_to_content: Optional[str] = None
@@ -5,22 +5,27 @@ Implements a real-time global chat room using WebSockets with the following logi
 1. Connection Logic - WebSocket handshake (accept)
 2. Storage Logic - Connection Manager to track active connections
 3. Listening Loop - Async while True to receive messages
-4. Broadcasting Logic - Send to all connected clients
+4. Broadcasting Logic - Batch queued events and send them to all connected clients
 5. Disconnect Logic - Cleanup on connection close
 """
 
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException
-from typing import List, Dict, Any
-import json
+from typing import Set, Dict, Any
+import asyncio
+import orjson
 from datetime import datetime
 from database.models import MessageDocument
 from beanie import PydanticObjectId
+from beanie.odm.utils.dump import get_dict
+from pymongo import WriteConcern
 from utils.timezone import now_ist
+from utils.object_id import is_object_id
 from fastapi import Query
-from jose import jwt, JWTError
-from auth.utils import SECRET_KEY, ALGORITHM
+import jwt
+from auth.utils import decode_access_token
+from auth.router import is_user_disabled, peek_cached_user, chat_display_name
+from routers.chat import invalidate_room_messages
 from auth.schemas import TokenData
-from database.models import UserDocument
 
 # ============================================================
 # 2. THE STORAGE LOGIC (Connection Manager)
@@ -30,38 +35,236 @@ class ConnectionManager:
     Manages all active WebSocket connections.
     """
     
+    # Upper bound on events coalesced into one outgoing frame
+    MAX_BATCH_SIZE = 128
+    # Frames a connection may fall behind by before it is evicted as too slow
+    CONNECTION_QUEUE_SIZE = 64
+    
     def __init__(self):
-        # Global list of all active WebSocket connections
-        self.active_connections: List[WebSocket] = []
+        # Global set of all active WebSocket connections (O(1) add/remove)
+        self.active_connections: Set[WebSocket] = set()
+        # Per-connection outgoing frames, each drained by its own writer task
+        self.queues: Dict[WebSocket, asyncio.Queue] = {}
+        self._writers: Dict[WebSocket, asyncio.Task] = {}
+        # Chat events waiting to be broadcast, drained by _broadcast_loop.
+        # Created in start() so the queue belongs to the running event loop.
+        self.outbox: asyncio.Queue = None
+        self._broadcast_task: asyncio.Task = None
     
     async def connect(self, websocket: WebSocket):
         """Adds the WebSocket connection to our registry (Assume already accepted)."""
         # await websocket.accept()  <-- Moved to endpoint
-        self.active_connections.append(websocket)
+        self.active_connections.add(websocket)
+        queue = asyncio.Queue(maxsize=self.CONNECTION_QUEUE_SIZE)
+        self.queues[websocket] = queue
+        self._writers[websocket] = asyncio.create_task(self._writer(websocket, queue))
         print(f"✅ New connection! Total active: {len(self.active_connections)}")
     
     def disconnect(self, websocket: WebSocket):
         """Removes the websocket from active connections."""
+        self.queues.pop(websocket, None)
+        writer = self._writers.pop(websocket, None)
+        if writer is not None and writer is not asyncio.current_task():
+            writer.cancel()
         if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
+            self.active_connections.discard(websocket)
             print(f"🔌 Connection closed. Total active: {len(self.active_connections)}")
     
-    async def broadcast(self, message: str):
-        """Iterates through all active connections and sends the message."""
-        connections_to_remove = []
+    async def _writer(self, websocket: WebSocket, queue: asyncio.Queue):
+        """Sends queued frames to one connection, so a slow client only delays itself."""
+        try:
+            while True:
+                payload = await queue.get()
+                await websocket.send_bytes(payload)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"⚠️ Failed to send to a connection: {e}")
+            self.disconnect(websocket)
+    
+    async def _evict(self, websocket: WebSocket):
+        """Closes a connection that fell too far behind (1013: try again later)."""
+        try:
+            await websocket.close(code=1013)
+        except Exception:
+            pass
+    
+    def broadcast(self, payload: bytes):
+        """
+        Queues the payload for every active connection without waiting on any of them.
         
-        for connection in self.active_connections:
+        The payload is encoded once by the caller and the same bytes go out as a
+        binary frame to every connection (clients decode it as UTF-8 JSON).
+        Connections whose queue is full are evicted instead of stalling the rest.
+        """
+        # Snapshot since evictions modify the registry
+        for websocket, queue in list(self.queues.items()):
+            try:
+                queue.put_nowait(payload)
+            except asyncio.QueueFull:
+                print("⚠️ Evicting a connection that is too slow to keep up")
+                self.disconnect(websocket)
+                asyncio.create_task(self._evict(websocket))
+
+    def send_to(self, websocket: WebSocket, event: Dict[str, Any]):
+        """Queues a single event for one connection only (e.g. an error reply)."""
+        queue = self.queues.get(websocket)
+        if queue is None:
+            return
+        try:
+            queue.put_nowait(orjson.dumps(event))
+        except asyncio.QueueFull:
+            print("⚠️ Evicting a connection that is too slow to keep up")
+            self.disconnect(websocket)
+            asyncio.create_task(self._evict(websocket))
+
+    def publish(self, event: Dict[str, Any]):
+        """Queues a chat event for the next broadcast batch."""
+        # Started from the lifespan normally; this covers apps run without it
+        self.start()
+        self.outbox.put_nowait(event)
+    
+    async def _broadcast_loop(self):
+        """
+        Waits for an event, then drains whatever else is already queued and sends
+        it all as one {"type": "batch", "items": [...]} frame.
+        """
+        while True:
+            batch = [await self.outbox.get()]
+            while len(batch) < self.MAX_BATCH_SIZE:
+                try:
+                    batch.append(self.outbox.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+            
             try:
-                await connection.send_text(message)
+                payload = orjson.dumps({"type": "batch", "items": batch}, option=orjson.OPT_NAIVE_UTC)
+                self.broadcast(payload)
             except Exception as e:
-                print(f"⚠️ Failed to send to a connection: {e}")
-                connections_to_remove.append(connection)
-        
-        for conn in connections_to_remove:
-            self.disconnect(conn)
+                # Never let one bad batch kill the loop
+                print(f"❌ Error broadcasting batch: {e}")
+    
+    def start(self):
+        """Starts the broadcast loop (call from the app lifespan)."""
+        if self._broadcast_task is None:
+            self.outbox = asyncio.Queue()
+            self._broadcast_task = asyncio.create_task(self._broadcast_loop())
+    
+    async def stop(self):
+        """Stops the broadcast loop (call from the app lifespan)."""
+        if self._broadcast_task is not None:
+            self._broadcast_task.cancel()
+            try:
+                await self._broadcast_task
+            except asyncio.CancelledError:
+                pass
+            self._broadcast_task = None
+            self.outbox = None
+
+# ============================================================
+# WRITE-BEHIND PERSISTENCE
+# ============================================================
+def _invalidate_rooms(room_ids: Set[str]):
+    """Drops the cached first pages of every room in room_ids."""
+    for room_id in room_ids:
+        invalidate_room_messages(room_id)
+
+
+class MessageWriter:
+    """
+    Persists chat messages in batches behind the broadcast.
+    
+    Messages get their ObjectId up front, so they can be broadcast before the
+    write lands. Queued messages are flushed with insert_many every
+    MAX_BATCH_SIZE messages or FLUSH_INTERVAL seconds, whichever comes first.
+    Durability window: messages queued in the last ~20ms are lost if the
+    process dies without running the lifespan shutdown. Inserts are also
+    unacknowledged (w=0): chat is ephemeral, so a rare lost message is an
+    acceptable price for not holding a pool connection per batch round-trip.
+    Server-side write failures are therefore not detected or logged.
+    Edits and deletes stay on the default write concern; one that arrives
+    before its message is written matches nothing, and the sender gets an
+    error frame instead of a broadcast.
+    """
+    
+    MAX_BATCH_SIZE = 200
+    FLUSH_INTERVAL = 0.02  # seconds
+    REINVALIDATE_DELAY = 0.5  # seconds; well under the 2s first-page cache TTL
+    
+    def __init__(self):
+        # Created in start() so the queue belongs to the running event loop
+        self.queue: asyncio.Queue = None
+        self._flush_task: asyncio.Task = None
+        self._collection = None
+    
+    def enqueue(self, message: MessageDocument):
+        """Queues a message (with its id already set) for the next batch insert."""
+        # Started from the lifespan normally; this covers apps run without it
+        self.start()
+        self.queue.put_nowait(message)
+    
+    async def _flush_loop(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            first = await self.queue.get()
+            if first is None:
+                break
+            batch = [first]
+            
+            # Keep collecting until the batch is full or the flush interval is up
+            deadline = loop.time() + self.FLUSH_INTERVAL
+            while len(batch) < self.MAX_BATCH_SIZE:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    message = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if message is None:
+                    # Shutdown requested: write what we have, then exit
+                    stopping = True
+                    break
+                batch.append(message)
+            
+            try:
+                # ordered=False: one bad document doesn't drop the rest of the batch
+                await self._collection.insert_many(
+                    [get_dict(message, to_db=True) for message in batch],
+                    ordered=False
+                )
+            except Exception as e:
+                # Only client-side failures (connection, encoding) land here:
+                # with w=0 the server never reports write errors back
+                print(f"❌ Failed to send {len(batch)} chat message(s) to MongoDB: {e}")
+            # w=0 returns before the server applies the batch, so a first page
+            # cached right now may still miss it: drop cached pages again shortly
+            room_ids = {message.room_id for message in batch}
+            _invalidate_rooms(room_ids)
+            loop.call_later(self.REINVALIDATE_DELAY, _invalidate_rooms, room_ids)
+    
+    def start(self):
+        """Starts the flush loop (call from the app lifespan)."""
+        if self._flush_task is None:
+            self.queue = asyncio.Queue()
+            self._collection = MessageDocument.get_pymongo_collection().with_options(
+                write_concern=WriteConcern(w=0)
+            )
+            self._flush_task = asyncio.create_task(self._flush_loop())
+    
+    async def stop(self):
+        """Flushes everything still queued, then stops (call from the app lifespan)."""
+        if self._flush_task is not None:
+            self.queue.put_nowait(None)
+            await self._flush_task
+            self._flush_task = None
+            self.queue = None
+            self._collection = None
 
 # Create a single global instance of the connection manager
 manager = ConnectionManager()
+message_writer = MessageWriter()
 
 # Create router for the chat endpoints
 router = APIRouter(prefix="/ws", tags=["websocket"])
@@ -89,24 +292,27 @@ async def websocket_chat_endpoint(websocket: WebSocket, token: str = Query(None)
         raise HTTPException(status_code=403, detail="Authentication required")
 
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-             raise HTTPException(status_code=403, detail="Invalid token")
-    except JWTError:
+        payload = decode_access_token(token)
+        email: str = payload["sub"]
+    except jwt.PyJWTError:
         raise HTTPException(status_code=403, detail="Invalid token")
         
-    # Get user from DB
-    user = await UserDocument.find_one(UserDocument.email == email)
-    if not user:
-        raise HTTPException(status_code=403, detail="User not found")
+    # The handshake makes no DB call: the name comes from the token, or from the
+    # auth cache when this user's HTTP requests have it warm (fresher after a
+    # profile edit); admin disables are picked up through the revocation set
+    cached_user = peek_cached_user(email)
+    if is_user_disabled(email) or (cached_user and cached_user.disabled):
+        raise HTTPException(status_code=403, detail="User disabled")
         
     # Validated Identity - NOW we accept
     await websocket.accept()
         
     # Validated Identity
-    current_user_email = user.email
-    current_user_name = user.display_name or user.username or user.email.split("@")[0]
+    current_user_email = email
+    if cached_user:
+        current_user_name = chat_display_name(email, cached_user.display_name, cached_user.username)
+    else:
+        current_user_name = payload.get("name") or email.split("@")[0]
 
     # 2. CONNECTION
     await manager.connect(websocket)
@@ -117,7 +323,7 @@ async def websocket_chat_endpoint(websocket: WebSocket, token: str = Query(None)
             data = await websocket.receive_text()
             
             try:
-                message_data = json.loads(data)
+                message_data = orjson.loads(data)
                 action_type = message_data.get("type", "message")
                 
                 # Metadata - FORCED from authenticated user (ignore client claims)
@@ -134,8 +340,10 @@ async def websocket_chat_endpoint(websocket: WebSocket, token: str = Query(None)
                     reply_to_content = message_data.get("reply_to_content")
 
                     if content:
-                        # 1. Save to DB
+                        # 1. Queue for a batched write; the id is assigned here so the
+                        #    broadcast doesn't wait on MongoDB
                         new_msg = MessageDocument(
+                            id=PydanticObjectId(),
                             sender_id=sender_id,
                             sender_name=username,
                             content=content,
@@ -146,62 +354,79 @@ async def websocket_chat_endpoint(websocket: WebSocket, token: str = Query(None)
                             reply_to_username=reply_to_username,
                             reply_to_content=reply_to_content
                         )
-                        await new_msg.insert()
+                        message_writer.enqueue(new_msg)
                         
-                        # 2. Broadcast with ID & Reply Info
-                        await manager.broadcast(json.dumps({
+                        # 2. Queue broadcast with ID & Reply Info
+                        manager.publish({
                             "type": "message",
                             "id": str(new_msg.id),
                             "username": username,
                             "sender_id": sender_id,
                             "message": content,
-                            "timestamp": new_msg.timestamp.isoformat(),
+                            "timestamp": new_msg.timestamp,
                             "reply_to_id": reply_to_id,
                             "reply_to_username": reply_to_username,
                             "reply_to_content": reply_to_content
-                        }))
+                        })
                 
                 # --- CASE 2: EDIT MESSAGE ---
                 elif action_type == "edit":
                     msg_id = message_data.get("id")
                     new_content = message_data.get("message")
                     
-                    if msg_id and new_content:
-                        # 1. Find message
-                        msg = await MessageDocument.get(PydanticObjectId(msg_id))
+                    if is_object_id(msg_id) and new_content:
+                        # 1. Update only if it's ours and not deleted (one round-trip, one field)
+                        oid = PydanticObjectId(msg_id)
+                        result = await MessageDocument.get_pymongo_collection().update_one(
+                            {"_id": oid, "sender_id": sender_id, "is_deleted": False},
+                            {"$set": {"content": new_content, "updated_at": now_ist()}}
+                        )
                         
-                        # 2. Verify ownership and update
-                        if msg and msg.sender_id == sender_id and not msg.is_deleted:
-                            msg.content = new_content
-                            await msg.save()
-                            
-                            # 3. Broadcast update
-                            await manager.broadcast(json.dumps({
+                        # 2. Queue broadcast of the update
+                        if result.matched_count:
+                            invalidate_room_messages()
+                            manager.publish({
                                 "type": "edit",
-                                "id": str(msg.id),
+                                "id": str(oid),
                                 "message": new_content
-                            }))
+                            })
+                        else:
+                            # Not ours, deleted, or not yet written by the batch writer
+                            manager.send_to(websocket, {
+                                "type": "error",
+                                "action": "edit",
+                                "id": str(oid),
+                                "detail": "Message not found or not editable"
+                            })
                             
                 # --- CASE 3: DELETE MESSAGE ---
                 elif action_type == "delete":
                     msg_id = message_data.get("id")
                     
-                    if msg_id:
-                        # 1. Find message
-                        msg = await MessageDocument.get(PydanticObjectId(msg_id))
+                    if is_object_id(msg_id):
+                        # 1. Soft delete only if it's ours
+                        oid = PydanticObjectId(msg_id)
+                        result = await MessageDocument.get_pymongo_collection().update_one(
+                            {"_id": oid, "sender_id": sender_id},
+                            {"$set": {"is_deleted": True}}
+                        )
                         
-                        # 2. Verify ownership and delete
-                        if msg and msg.sender_id == sender_id:
-                            msg.is_deleted = True
-                            await msg.save()
-                            
-                            # 3. Broadcast deletion
-                            await manager.broadcast(json.dumps({
+                        # 2. Queue broadcast of the deletion
+                        if result.matched_count:
+                            invalidate_room_messages()
+                            manager.publish({
                                 "type": "delete",
-                                "id": str(msg.id)
-                            }))
+                                "id": str(oid)
+                            })
+                        else:
+                            manager.send_to(websocket, {
+                                "type": "error",
+                                "action": "delete",
+                                "id": str(oid),
+                                "detail": "Message not found or not deletable"
+                            })
 
-            except json.JSONDecodeError:
+            except orjson.JSONDecodeError:
                 pass
             except Exception as e:
                 print(f"❌ Error processing message: {e}")
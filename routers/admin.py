@@ -4,13 +4,16 @@ Admin Router - Admin-only endpoints for managing the application.
 Provides stats, user management, and moderation endpoints.
 """
 
+import asyncio
 from fastapi import APIRouter, Depends, Query, HTTPException, status, Body
-from auth.router import get_current_admin
+from auth.router import get_current_admin, invalidate_user, set_user_disabled
 from auth.schemas import User
-from database.models import UserDocument, MessageDocument, UserRole
+from database.models import UserDocument, UserListView, MessageDocument, UserRole
+from database.counts import estimated_count
+from routers.chat import invalidate_room_messages
 from utils.timezone import now_ist
+from utils.object_id import is_object_id
 from beanie import PydanticObjectId
-from bson.errors import InvalidId
 from pydantic import BaseModel
 from datetime import datetime
 
@@ -27,27 +30,17 @@ async def get_admin_stats(current_user: User = Depends(get_current_admin)):
     
     Admin-only endpoint.
     """
-    # Count all users
-    total_users = await UserDocument.count()
-    
-    # Count active users (not disabled)
-    active_users = await UserDocument.find(
-        UserDocument.disabled == False
-    ).count()
-    
-    # Count admins
-    admin_count = await UserDocument.find(
-        UserDocument.role == UserRole.ADMIN
-    ).count()
-    
-    # Count total messages
-    total_messages = await MessageDocument.count()
-    
-    # Count new users today
     today_start = now_ist().replace(hour=0, minute=0, second=0, microsecond=0)
-    new_users_today = await UserDocument.find(
-        UserDocument.created_at >= today_start
-    ).count()
+    
+    # Independent counts run concurrently; the role and created_at filters are
+    # index-backed and the collection totals come from metadata
+    active_users, admin_count, new_users_today, total_users, total_messages = await asyncio.gather(
+        UserDocument.find(UserDocument.disabled == False).count(),
+        UserDocument.find(UserDocument.role == UserRole.ADMIN).count(),
+        UserDocument.find(UserDocument.created_at >= today_start).count(),
+        estimated_count(UserDocument),
+        estimated_count(MessageDocument)
+    )
     
     return {
         "total_users": total_users,
@@ -69,7 +62,7 @@ async def get_all_users(
     
     Admin-only endpoint.
     """
-    users = await UserDocument.find_all().skip(skip).limit(limit).to_list()
+    users = await UserDocument.find_all().project(UserListView).skip(skip).limit(limit).to_list()
     
     return [
         {
@@ -119,6 +112,7 @@ async def update_user_role(
     
     user.role = UserRole(role)
     await user.save()
+    invalidate_user(user.email)
     
     return {"message": f"User role updated to {role}", "email": email, "role": role}
 
@@ -149,6 +143,8 @@ async def toggle_user_disabled(
     
     user.disabled = not user.disabled
     await user.save()
+    invalidate_user(user.email)
+    set_user_disabled(user.email, user.disabled)
     
     status_text = "disabled" if user.disabled else "enabled"
     return {"message": f"User {status_text}", "email": email, "disabled": user.disabled}
@@ -164,14 +160,13 @@ async def delete_message(
     
     Admin-only endpoint.
     """
-    try:
-        message = await MessageDocument.get(PydanticObjectId(message_id))
-    except (InvalidId, ValueError):
+    if not is_object_id(message_id):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid message ID"
         )
     
+    message = await MessageDocument.get(PydanticObjectId(message_id))
     if not message:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -179,5 +174,6 @@ async def delete_message(
         )
     
     await message.delete()
+    invalidate_room_messages(message.room_id)
     
     return {"message": "Message deleted", "message_id": message_id}
@@ -5,8 +5,10 @@ This module implements endpoints for the global chat feature,
 with CRUD operations for messages using MongoDB via Beanie.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from utils.responses import ORJSONResponse
+from pydantic import TypeAdapter
+from cachetools import TTLCache
 from typing import Optional
 
 from schemas.chat import (
@@ -16,19 +18,40 @@ from schemas.chat import (
     MessageListResponse,
     ChatStatusResponse
 )
-from database.models import MessageDocument
+from database.models import MessageDocument, MessageView
+from database.counts import live_message_count
 from auth.router import get_current_user
 from auth.schemas import User
 from beanie import PydanticObjectId
+from pymongo import ReturnDocument
+from utils.timezone import now_ist, utc_to_ist
+from utils.object_id import is_object_id
 
 router = APIRouter(prefix="/api/chat", tags=["chat"])
 
+# Pages are serialized straight to JSON bytes, so cache hits skip both the
+# query and FastAPI's re-validation against response_model
+_MESSAGE_PAGE_ADAPTER = TypeAdapter(MessageListResponse)
+
+# Newest page of a room: (room_id, page_size) -> serialized MessageListResponse.
+# Every page load fetches it, so it is served from memory for up to 2 seconds;
+# anything that changes a room's messages must call invalidate_room_messages().
+_FIRST_PAGE_CACHE: TTLCache = TTLCache(maxsize=256, ttl=2)
+FIRST_PAGE_CACHE_MAX_PAGE_SIZE = 50
+
+
+def invalidate_room_messages(room_id: Optional[str] = None) -> None:
+    """Drop cached first pages for a room (or for every room if room_id is None)."""
+    if room_id is None:
+        _FIRST_PAGE_CACHE.clear()
+        return
+    for key in [key for key in _FIRST_PAGE_CACHE if key[0] == room_id]:
+        _FIRST_PAGE_CACHE.pop(key, None)
+
 
 # --- Helper Functions ---
-def message_to_response(msg: MessageDocument) -> MessageResponse:
+def message_to_response(msg: MessageDocument | MessageView) -> MessageResponse:
     """Convert MessageDocument to MessageResponse with IST timestamp."""
-    from utils.timezone import utc_to_ist
-    
     # MongoDB stores dates in UTC, convert back to IST for display
     ist_timestamp = utc_to_ist(msg.timestamp) if msg.timestamp else msg.timestamp
     
@@ -63,6 +86,13 @@ async def get_messages(
 
     Protected endpoint - requires valid JWT token.
     """
+    cache_key = (room_id, page_size)
+    cacheable = page == 1 and page_size <= FIRST_PAGE_CACHE_MAX_PAGE_SIZE
+    if cacheable:
+        cached = _FIRST_PAGE_CACHE.get(cache_key)
+        if cached is not None:
+            return Response(cached, media_type="application/json")
+    
     # Query MongoDB for messages
     query = MessageDocument.find(
         MessageDocument.room_id == room_id,
@@ -74,15 +104,18 @@ async def get_messages(
     
     # Apply pagination
     skip = (page - 1) * page_size
-    messages = await query.skip(skip).limit(page_size).to_list()
+    messages = await query.project(MessageView).skip(skip).limit(page_size).to_list()
 
-    return MessageListResponse(
+    body = _MESSAGE_PAGE_ADAPTER.dump_json(MessageListResponse(
         messages=[message_to_response(m) for m in messages],
         total_count=total_count,
         page=page,
         page_size=page_size,
         has_more=(skip + page_size) < total_count
-    )
+    ))
+    if cacheable:
+        _FIRST_PAGE_CACHE[cache_key] = body
+    return Response(body, media_type="application/json")
 
 
 @router.post("/messages", response_model=MessageResponse, status_code=status.HTTP_201_CREATED)
@@ -117,6 +150,7 @@ async def send_message(
     )
 
     await new_message.insert()
+    invalidate_room_messages(new_message.room_id)
 
     return message_to_response(new_message)
 
@@ -131,20 +165,39 @@ async def get_message(
 
     Protected endpoint - requires valid JWT token.
     """
-    try:
-        msg = await MessageDocument.get(PydanticObjectId(message_id))
-    except Exception:
+    msg = await MessageDocument.get(_message_oid(message_id))
+    if not msg or msg.is_deleted:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Message not found"
         )
-    
-    if not msg or msg.is_deleted:
+    return message_to_response(msg)
+
+
+def _message_oid(message_id: str) -> PydanticObjectId:
+    """Parse a message ID path parameter, rejecting malformed IDs before any DB call."""
+    if not is_object_id(message_id):
         raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid message ID"
+        )
+    return PydanticObjectId(message_id)
+
+
+async def _ownership_error(oid: PydanticObjectId, action: str) -> HTTPException:
+    """Work out why a sender-scoped update matched nothing: missing/deleted (404) or not yours (403)."""
+    msg = await MessageDocument.get_pymongo_collection().find_one(
+        {"_id": oid}, projection={"is_deleted": 1}
+    )
+    if not msg or msg.get("is_deleted"):
+        return HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Message not found"
         )
-    return message_to_response(msg)
+    return HTTPException(
+        status_code=status.HTTP_403_FORBIDDEN,
+        detail=f"You can only {action} your own messages"
+    )
 
 
 @router.put("/messages/{message_id}", response_model=MessageResponse)
@@ -158,33 +211,27 @@ async def update_message(
     
     Protected endpoint - requires valid JWT token.
     """
-    try:
-        msg = await MessageDocument.get(PydanticObjectId(message_id))
-    except Exception:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Message not found"
-        )
+    oid = _message_oid(message_id)
     
-    if not msg or msg.is_deleted:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Message not found"
-        )
-        
-    # Only allow sender to edit their own messages
-    if msg.sender_id != current_user.email:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="You can only edit your own messages"
-        )
-
+    # Ownership and soft-delete checks live in the filter, so a successful edit
+    # is a single round-trip that only writes the changed fields
+    owned_live_message = {"_id": oid, "sender_id": current_user.email, "is_deleted": False}
+    collection = MessageDocument.get_pymongo_collection()
     if update_data.content:
-        msg.content = update_data.content
-        msg.updated_at = datetime.now()
-        await msg.save()
-        
-    return message_to_response(msg)
+        msg = await collection.find_one_and_update(
+            owned_live_message,
+            {"$set": {"content": update_data.content, "updated_at": now_ist()}},
+            return_document=ReturnDocument.AFTER
+        )
+    else:
+        msg = await collection.find_one(owned_live_message)
+    
+    if not msg:
+        raise await _ownership_error(oid, "edit")
+    
+    message = MessageView.model_validate(msg)
+    invalidate_room_messages(message.room_id)
+    return message_to_response(message)
 
 
 @router.delete("/messages/{message_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -197,29 +244,16 @@ async def delete_message(
 
     Protected endpoint - requires valid JWT token.
     """
-    try:
-        msg = await MessageDocument.get(PydanticObjectId(message_id))
-    except Exception:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Message not found"
-        )
+    oid = _message_oid(message_id)
     
-    if not msg or msg.is_deleted:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Message not found"
-        )
-
-    # Only allow sender to delete their own messages
-    if msg.sender_id != current_user.email:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="You can only delete your own messages"
-        )
+    result = await MessageDocument.get_pymongo_collection().update_one(
+        {"_id": oid, "sender_id": current_user.email, "is_deleted": False},
+        {"$set": {"is_deleted": True}}
+    )
+    if not result.matched_count:
+        raise await _ownership_error(oid, "delete")
+    invalidate_room_messages()
 
-    msg.is_deleted = True
-    await msg.save()
     return None
 
 
@@ -235,12 +269,10 @@ async def get_chat_status(
 
     Protected endpoint - requires valid JWT token.
     """
-    total_messages = await MessageDocument.find(
-        MessageDocument.is_deleted == False
-    ).count()
+    total_messages = await live_message_count()
 
-    return ChatStatusResponse(
+    return ORJSONResponse(ChatStatusResponse(
         online_users=0,  # TODO: Implement with WebSocket connections
         total_messages=total_messages,
         websocket_ready=False  # TODO: Set to True when WebSockets implemented
-    )
+    ))
@@ -5,7 +5,10 @@ This module implements endpoints for the dashboard feature,
 returning aggregated statistics from MongoDB.
 """
 
+import asyncio
+import time
 from fastapi import APIRouter, Depends
+from utils.responses import ORJSONResponse
 from datetime import datetime, timedelta, timezone
 
 from schemas.dashboard import (
@@ -15,27 +18,40 @@ from schemas.dashboard import (
     GlobalMetrics,
 )
 from database.models import UserDocument, MessageDocument
+from database.counts import estimated_count, live_message_count
 from auth.router import get_current_user
 from auth.schemas import User
 
 router = APIRouter(prefix="/api/dashboard", tags=["dashboard"])
 
+# "New users" cut-off, shared by every dashboard hit for up to a minute so the
+# count query is identical across requests: (computed_at monotonic, boundary)
+NEW_USER_BOUNDARY_TTL = 60
+_new_user_boundary: tuple[float, datetime] | None = None
+
+
+def _new_users_since() -> datetime:
+    """Start of the last-24-hours window, recomputed at most once a minute."""
+    global _new_user_boundary
+    now = time.monotonic()
+    if _new_user_boundary is None or now - _new_user_boundary[0] >= NEW_USER_BOUNDARY_TTL:
+        _new_user_boundary = (now, datetime.now(timezone.utc) - timedelta(days=1))
+    return _new_user_boundary[1]
+
 
 # --- Database Query Functions ---
 async def get_user_stats() -> UserStats:
     """Get user statistics from MongoDB."""
-    total_users = await UserDocument.count()
-    
     # Count users created in the last 24 hours
-    yesterday = datetime.now(timezone.utc) - timedelta(days=1)
-    new_users_today = await UserDocument.find(
-        UserDocument.created_at >= yesterday
-    ).count()
+    yesterday = _new_users_since()
     
-    # Active users = users who are not disabled
-    active_users = await UserDocument.find(
-        UserDocument.disabled == False
-    ).count()
+    # Independent counts, so run them concurrently
+    # (active users = users who are not disabled)
+    total_users, new_users_today, active_users = await asyncio.gather(
+        estimated_count(UserDocument),
+        UserDocument.find(UserDocument.created_at >= yesterday).count(),
+        UserDocument.find(UserDocument.disabled == False).count()
+    )
     
     return UserStats(
         total_users=total_users,
@@ -56,9 +72,7 @@ async def get_activity_summary() -> ActivitySummary:
 
 async def get_global_metrics() -> GlobalMetrics:
     """Get global platform metrics from MongoDB."""
-    total_messages = await MessageDocument.find(
-        MessageDocument.is_deleted == False
-    ).count()
+    total_messages = await live_message_count()
     
     return GlobalMetrics(
         total_timer_starts=0,  # TODO: Track timer usage
@@ -82,12 +96,18 @@ async def get_dashboard(
 
     Protected endpoint - requires valid JWT token.
     """
-    return DashboardResponse(
-        user_stats=await get_user_stats(),
-        activity_summary=await get_activity_summary(),
-        global_metrics=await get_global_metrics(),
-        last_updated=datetime.now(timezone.utc)
+    user_stats, activity_summary, global_metrics = await asyncio.gather(
+        get_user_stats(),
+        get_activity_summary(),
+        get_global_metrics()
     )
+    # orjson serializes the dataclasses as-is; response_model only documents the shape
+    return ORJSONResponse(DashboardResponse(
+        user_stats=user_stats,
+        activity_summary=activity_summary,
+        global_metrics=global_metrics,
+        last_updated=datetime.now(timezone.utc)
+    ))
 
 
 @router.get("/me")
@@ -4,9 +4,14 @@ Profile Router - User profile management endpoints.
 Provides CRUD operations for user profiles, onboarding flow, and password change.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from datetime import datetime
-from pydantic import BaseModel
+from __future__ import annotations
+
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from pydantic import TypeAdapter
+from cachetools import LRUCache
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 
 from schemas.profile import (
     ProfileResponse,
@@ -14,18 +19,30 @@ from schemas.profile import (
     OnboardingData,
     OnboardingResponse
 )
-from database.models import UserDocument
-from auth.router import get_current_user
+from database.models import UserDocument, UserProfileView
+from auth.router import get_current_user, get_user_profile, invalidate_user
 from auth.schemas import User, PasswordChange
 from auth.utils import verify_password, get_password_hash
 from utils.timezone import now_ist
 
 router = APIRouter(prefix="/api/profile", tags=["profile"])
 
+# Serializes profiles straight to JSON bytes. Returning a Response skips FastAPI's
+# re-validation of the model against response_model (still used for the docs).
+_PROFILE_ADAPTER = TypeAdapter(ProfileResponse)
+
+# Emails whose onboarding is done. profile_complete never goes back to False,
+# so these entries can't go stale and need no TTL or invalidation.
+_ONBOARDED: LRUCache = LRUCache(maxsize=100_000)
+
+# Fields returned by profile writes that echo the updated profile
+PROFILE_PROJECTION = {"_id": 0, **{field: 1 for field in UserProfileView.model_fields}}
 
-def user_to_profile_response(user: UserDocument) -> ProfileResponse:
-    """Convert UserDocument to ProfileResponse."""
-    return ProfileResponse(
+
+def user_to_profile_response(user: UserDocument | UserProfileView) -> ProfileResponse:
+    """Convert a UserDocument or profile projection to ProfileResponse."""
+    # Values come straight from our own DB, so skip Pydantic validation
+    return ProfileResponse.model_construct(
         email=user.email,
         username=user.username,
         display_name=user.display_name,
@@ -37,6 +54,11 @@ def user_to_profile_response(user: UserDocument) -> ProfileResponse:
     )
 
 
+def profile_json_response(user: UserDocument | UserProfileView) -> Response:
+    """Build the JSON response for a profile without a second validation pass."""
+    return Response(_PROFILE_ADAPTER.dump_json(user_to_profile_response(user)), media_type="application/json")
+
+
 @router.get("", response_model=ProfileResponse)
 async def get_profile(current_user: User = Depends(get_current_user)):
     """
@@ -44,13 +66,13 @@ async def get_profile(current_user: User = Depends(get_current_user)):
     
     Protected endpoint - requires valid JWT token.
     """
-    user = await UserDocument.find_one(UserDocument.email == current_user.email)
+    user = await get_user_profile(current_user.email)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
-    return user_to_profile_response(user)
+    return profile_json_response(user)
 
 
 @router.patch("", response_model=ProfileResponse)
@@ -63,41 +85,42 @@ async def update_profile(
     
     Protected endpoint - requires valid JWT token.
     """
-    user = await UserDocument.find_one(UserDocument.email == current_user.email)
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
-    
-    # Check username uniqueness if being updated
-    if updates.username and updates.username != user.username:
-        existing = await UserDocument.find_one(UserDocument.username == updates.username)
-        if existing:
+    update_data = updates.model_dump(exclude_unset=True)
+    collection = UserDocument.get_pymongo_collection()
+    
+    user = None
+    if update_data:
+        # The filter only matches if some submitted field differs from what is
+        # stored (compared in MongoDB, not against a per-process cache), so a
+        # no-op PATCH writes nothing. The unique username index rejects a taken username.
+        try:
+            user = await collection.find_one_and_update(
+                {
+                    "email": current_user.email,
+                    "$or": [{field: {"$ne": value}} for field, value in update_data.items()]
+                },
+                {"$set": {**update_data, "updated_at": now_ist()}},
+                projection=PROFILE_PROJECTION,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Username already taken"
             )
     
-    # Apply updates
-    update_data = updates.model_dump(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(user, field, value)
-    
-    user.updated_at = now_ist()
-    
-    try:
-        await user.save()
-    except Exception as e:
-        # Handle duplicate key error (race condition fallback)
-        if "duplicate key" in str(e).lower() or "E11000" in str(e):
+    if user:
+        invalidate_user(current_user.email)
+    else:
+        # Nothing to change (or no such user): answer with the stored profile
+        user = await collection.find_one({"email": current_user.email}, projection=PROFILE_PROJECTION)
+        if not user:
             raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Username already taken"
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found"
             )
-        raise
     
-    return user_to_profile_response(user)
+    return profile_json_response(UserProfileView.model_validate(user))
 
 
 @router.post("/complete", response_model=OnboardingResponse)
@@ -113,30 +136,33 @@ async def complete_onboarding(
     
     Protected endpoint - requires valid JWT token.
     """
-    user = await UserDocument.find_one(UserDocument.email == current_user.email)
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
+    # One round-trip instead of a user lookup, a username lookup and a save:
+    # the unique username index rejects a taken username
+    try:
+        result = await UserDocument.get_pymongo_collection().update_one(
+            {"email": current_user.email},
+            {"$set": {
+                "username": data.username,
+                "display_name": data.display_name or data.username,
+                "age": data.age,
+                "bio": data.bio,
+                "profile_complete": True,
+                "updated_at": now_ist()
+            }}
         )
-    
-    # Check username uniqueness
-    existing = await UserDocument.find_one(UserDocument.username == data.username)
-    if existing and existing.email != user.email:
+    except DuplicateKeyError:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Username already taken"
         )
     
-    # Update profile
-    user.username = data.username
-    user.display_name = data.display_name or data.username
-    user.age = data.age
-    user.bio = data.bio
-    user.profile_complete = True
-    user.updated_at = now_ist()
-    
-    await user.save()
+    if not result.matched_count:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    invalidate_user(current_user.email)
+    _ONBOARDED[current_user.email] = True
     
     return OnboardingResponse(
         message="Profile completed successfully!",
@@ -152,12 +178,17 @@ async def get_profile_status(current_user: User = Depends(get_current_user)):
     
     Protected endpoint - requires valid JWT token.
     """
-    user = await UserDocument.find_one(UserDocument.email == current_user.email)
+    if current_user.email in _ONBOARDED:
+        return {"profile_complete": True, "redirect_to": "/dashboard"}
+    
+    user = await get_user_profile(current_user.email)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
+    if user.profile_complete:
+        _ONBOARDED[current_user.email] = True
     
     return {
         "profile_complete": user.profile_complete,
@@ -167,6 +198,7 @@ async def get_profile_status(current_user: User = Depends(get_current_user)):
 
 @router.post("/password")
 async def change_password(
+    request: Request,
     data: PasswordChange,
     current_user: User = Depends(get_current_user)
 ):
@@ -178,27 +210,18 @@ async def change_password(
     
     Protected endpoint - requires valid JWT token.
     """
-    user = await UserDocument.find_one(UserDocument.email == current_user.email)
-    if not user:
+    # Auth record (with the password hash) already resolved by get_current_user
+    user = request.state.user_record
+    
+    # Cheap checks first, so a rejected request never pays for a bcrypt verify
+    # Current password is required ONLY if user has one
+    # (no hashed_password means an OAuth user setting it for the first time)
+    if user.hashed_password and not data.current_password:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Current password is required"
         )
     
-    # Verify current password ONLY if user has one
-    if user.hashed_password:
-        if not data.current_password:
-             raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Current password is required"
-            )
-        if not verify_password(data.current_password, user.hashed_password):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Current password is incorrect"
-            )
-    # If no hashed_password (OAuth user), we skip verification (they are setting it for the first time)
-    
     # Validate new password
     if len(data.new_password) < 8:
         raise HTTPException(
@@ -212,9 +235,21 @@ async def change_password(
             detail="New password must be different from current password"
         )
     
+    if user.hashed_password and not await asyncio.to_thread(
+        verify_password, data.current_password, user.hashed_password
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Current password is incorrect"
+        )
+    
     # Hash and save new password
-    user.hashed_password = get_password_hash(data.new_password)
-    user.updated_at = now_ist()
-    await user.save()
+    # bcrypt is CPU-bound, so hash in a worker thread to keep the event loop free
+    new_hash = await asyncio.to_thread(get_password_hash, data.new_password)
+    await UserDocument.get_pymongo_collection().update_one(
+        {"email": user.email},
+        {"$set": {"hashed_password": new_hash, "updated_at": now_ist()}}
+    )
+    invalidate_user(user.email)
     
     return {"message": "Password changed successfully"}
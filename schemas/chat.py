@@ -5,7 +5,8 @@ This module defines request/response schemas for the chat API,
 including message creation, updates, and paginated responses.
 """
 
-from pydantic import BaseModel, Field
+from dataclasses import dataclass
+from pydantic import BaseModel, ConfigDict, Field
 from typing import List, Optional
 from datetime import datetime
 
@@ -30,6 +31,8 @@ class MessageUpdate(BaseModel):
 # --- Response Schemas ---
 class MessageResponse(BaseModel):
     """Schema for single message response."""
+    model_config = ConfigDict(frozen=True)
+    
     id: str
     sender_id: str
     sender_name: Optional[str]
@@ -46,6 +49,8 @@ class MessageResponse(BaseModel):
 
 class MessageListResponse(BaseModel):
     """Paginated list of messages."""
+    model_config = ConfigDict(frozen=True)
+    
     messages: List[MessageResponse]
     total_count: int
     page: int
@@ -53,8 +58,9 @@ class MessageListResponse(BaseModel):
     has_more: bool
 
 
-class ChatStatusResponse(BaseModel):
-    """Chat system status."""
+@dataclass(slots=True, frozen=True)
+class ChatStatusResponse:
+    """Chat system status (a dataclass: built from trusted counts, serialized by orjson)."""
     online_users: int = 0
     total_messages: int = 0
     websocket_ready: bool = False  # TODO: Future WebSocket integration
@@ -3,29 +3,36 @@ Dashboard Schemas - Pydantic models for dashboard endpoints.
 
 This module defines request/response schemas for the dashboard API,
 including user statistics, activity summaries, and pagination.
+
+The dashboard responses are built server-side from trusted counts, so they
+are plain dataclasses that orjson serializes directly (no Pydantic validation).
 """
 
+from dataclasses import dataclass
 from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime
 
 
 # --- Nested Response Models ---
-class UserStats(BaseModel):
+@dataclass(slots=True, frozen=True)
+class UserStats:
     """User statistics for dashboard."""
     total_users: int = 0
     active_users: int = 0
     new_users_today: int = 0
 
 
-class ActivitySummary(BaseModel):
+@dataclass(slots=True, frozen=True)
+class ActivitySummary:
     """Recent activity summary."""
     total_sessions: int = 0
     total_time_seconds: int = 0
     average_session_minutes: float = 0.0
 
 
-class GlobalMetrics(BaseModel):
+@dataclass(slots=True, frozen=True)
+class GlobalMetrics:
     """Global platform metrics."""
     total_timer_starts: int = 0
     total_messages_sent: int = 0
@@ -33,7 +40,8 @@ class GlobalMetrics(BaseModel):
 
 
 # --- Main Response Model ---
-class DashboardResponse(BaseModel):
+@dataclass(slots=True, frozen=True)
+class DashboardResponse:
     """Complete dashboard data response."""
     user_stats: UserStats
     activity_summary: ActivitySummary
@@ -4,7 +4,7 @@ Profile Schemas
 Pydantic models for user profile operations.
 """
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import Optional
 from datetime import datetime
 
@@ -20,8 +20,10 @@ class ProfileResponse(BaseModel):
     profile_complete: bool = False
     created_at: Optional[datetime] = None
     
-    class Config:
-        json_schema_extra = {
+    # Built once from trusted DB values and never modified afterwards
+    model_config = ConfigDict(
+        frozen=True,
+        json_schema_extra={
             "example": {
                 "email": "user@example.com",
                 "username": "cooluser",
@@ -30,6 +32,7 @@ class ProfileResponse(BaseModel):
                 "profile_complete": True
             }
         }
+    )
 
 
 class ProfileUpdate(BaseModel):
@@ -1,4 +1,6 @@
 # Utils package
 from utils.timezone import now_ist, utc_to_ist, format_ist, IST
+from utils.object_id import is_object_id
+from utils.responses import ORJSONResponse
 
-__all__ = ["now_ist", "utc_to_ist", "format_ist", "IST"]
+__all__ = ["now_ist", "utc_to_ist", "format_ist", "IST", "is_object_id", "ORJSONResponse"]
@@ -0,0 +1,20 @@
+"""
+ObjectId helpers.
+
+Message IDs arrive as path parameters and WebSocket payload fields; checking
+their shape up front lets handlers reject junk without touching the database.
+"""
+
+import re
+
+OBJECT_ID_RE = re.compile(r"[0-9a-fA-F]{24}")
+
+
+def is_object_id(value) -> bool:
+    """
+    Check that a value looks like a MongoDB ObjectId.
+    
+    Returns:
+        bool: True if value is a 24-character hex string
+    """
+    return isinstance(value, str) and OBJECT_ID_RE.fullmatch(value) is not None
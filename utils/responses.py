@@ -0,0 +1,18 @@
+"""
+JSON response classes.
+
+FastAPI deprecated its own ORJSONResponse, so the routers that build their
+payloads by hand (dataclasses, raw aggregation results) use this one instead.
+"""
+
+from typing import Any
+
+import orjson
+from starlette.responses import JSONResponse
+
+
+class ORJSONResponse(JSONResponse):
+    """JSON response serialized with orjson; same options as FastAPI's old class."""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
@@ -9,6 +9,9 @@ from datetime import datetime, timezone, timedelta
 # IST timezone (UTC+5:30)
 IST = timezone(timedelta(hours=5, minutes=30))
 
+# Default display format for format_ist()
+DEFAULT_IST_FORMAT = "%Y-%m-%d %H:%M:%S IST"
+
 
 def now_ist() -> datetime:
     """
@@ -36,7 +39,7 @@ def utc_to_ist(dt: datetime) -> datetime:
     return dt.astimezone(IST)
 
 
-def format_ist(dt: datetime, fmt: str = "%Y-%m-%d %H:%M:%S IST") -> str:
+def format_ist(dt: datetime, fmt: str = DEFAULT_IST_FORMAT) -> str:
     """
     Format datetime in IST for display.
     
@@ -47,5 +50,6 @@ def format_ist(dt: datetime, fmt: str = "%Y-%m-%d %H:%M:%S IST") -> str:
     Returns:
         str: Formatted datetime string
     """
-    ist_dt = utc_to_ist(dt) if dt.tzinfo != IST else dt
+    # Identity check: now_ist() and utc_to_ist() attach this exact IST object
+    ist_dt = dt if dt.tzinfo is IST else utc_to_ist(dt)
     return ist_dt.strftime(fmt)